@@ -1,6 +1,8 @@
 # Diagarp Streamlit App – Full-width UI with Ranked Diagnosis Output
 
 import streamlit as st
+import hashlib
+import json
 from typing import List
 
 st.set_page_config(page_title="Diagarp Cattle Diagnosis", layout="wide", page_icon="🐄")
@@ -56,7 +58,7 @@ decision_tree = {
     },
     "brd_q3": {
         "question": "Is the cow's rectal temperature above 39.5°C?",
-        "yes": "brd_q4",
+        "yes": "brd_q5",
         "no": "unknown_final"
     },
     "brd_q5": {
@@ -285,22 +287,152 @@ decision_tree = {
         "prevention": "Continue regular monitoring and record-keeping."
     }
 }
-# --- Utility Function ---
-def get_likely_diagnoses(tree):
-    diagnoses = []
-    for node in tree.values():
-        if isinstance(node, dict) and "diagnosis" in node and "likelihood" in node:
-            diagnoses.append((
-                node["diagnosis"],
-                node["likelihood"],
-                node.get("treatment", ""),
-                node.get("prevention", "")
-            ))
-    return sorted(diagnoses, key=lambda x: x[1], reverse=True)
+# --- Compiled Tree Engine ---
+# decision_tree is compiled once per process into integer node IDs and parallel arrays; session state
+# only holds the current node ID, and the pages walk the arrays instead of string-keyed dicts.
+class Leaf:
+    __slots__ = ("key", "diagnosis", "likelihood", "treatment", "prevention")
+
+    def __init__(self, key, node):
+        self.key = key
+        self.diagnosis = node["diagnosis"]
+        self.likelihood = node.get("likelihood", 0)
+        self.treatment = node.get("treatment", "")
+        self.prevention = node.get("prevention", "")
+
+
+class TreeError(ValueError):
+    pass
+
+
+class CompiledTree:
+    __slots__ = ("keys", "ids", "questions", "yes", "no", "options", "leaves", "root", "reachable", "ranked")
+
+    def __init__(self, tree, root="start", top_k=3):
+        self.keys = tuple(tree)
+        self.ids = {key: i for i, key in enumerate(self.keys)}
+        # -1 marks an edge to a node that does not exist
+        target = lambda key: self.ids.get(key, -1)
+        nodes = [tree[key] for key in self.keys]
+        self.questions = tuple(node.get("question") for node in nodes)
+        self.yes = tuple(target(node["yes"]) if "yes" in node else -1 for node in nodes)
+        self.no = tuple(target(node["no"]) if "no" in node else -1 for node in nodes)
+        self.options = tuple(
+            tuple((label, target(dest)) for label, dest in node["options"].items()) if "options" in node else None
+            for node in nodes
+        )
+        self.leaves = tuple(Leaf(key, node) if "diagnosis" in node else None for key, node in zip(self.keys, nodes))
+        self.root = self.ids[root]
+        self.reachable = self._validate(tree)
+        # per node, its top_k reachable leaves by likelihood
+        self.ranked = tuple(
+            tuple(sorted(leaves, key=lambda leaf: -self.leaves[leaf].likelihood)[:top_k]) for leaves in self.reachable
+        )
+
+    def edges(self, state):
+        if self.leaves[state] is not None:
+            return []
+        if self.options[state] is not None:
+            return [dest for _, dest in self.options[state]]
+        return [self.yes[state], self.no[state]]
+
+    def _validate(self, tree):
+        # Walks the graph once: dangling edges, cycles and unreachable nodes are fatal; the result is the
+        # set of leaf IDs reachable from every node, for features that need it without rewalking
+        problems = []
+        for i, key in enumerate(self.keys):
+            node = tree[key]
+            if self.leaves[i] is None and self.questions[i] is None:
+                problems.append(f"{key!r} has neither a question nor a diagnosis")
+            dests = list(node["options"].values()) if "options" in node else [node.get("yes"), node.get("no")]
+            if self.leaves[i] is None:
+                problems += [f"{key!r} points to missing node {dest!r}" for dest in dests if dest not in self.ids]
+        reachable = [None] * len(self.keys)
+        visiting = set()
+        stack = [(self.root, False)]
+        while stack:
+            state, done = stack.pop()
+            if done:
+                visiting.discard(state)
+                if self.leaves[state] is not None:
+                    reachable[state] = frozenset([state])
+                else:
+                    reachable[state] = frozenset().union(*(reachable[d] or () for d in self.edges(state) if d != -1))
+                continue
+            if reachable[state] is not None:
+                continue
+            if state in visiting:
+                problems.append(f"cycle through {self.keys[state]!r}")
+                continue
+            visiting.add(state)
+            stack.append((state, True))
+            stack += [(d, False) for d in self.edges(state) if d != -1 and reachable[d] is None]
+        unreachable = [key for key, leaves in zip(self.keys, reachable) if leaves is None]
+        if unreachable:
+            problems.append(f"unreachable from {self.keys[self.root]!r}: {', '.join(unreachable)}")
+        if problems:
+            raise TreeError("Invalid decision tree:\n" + "\n".join(problems))
+        return tuple(reachable)
+
+    def start(self):
+        return self.root
+
+    def is_leaf(self, state):
+        return self.leaves[state] is not None
+
+    def leaf(self, state):
+        return self.leaves[state]
+
+    def question(self, state):
+        return self.questions[state]
+
+    def choices(self, state):
+        options = self.options[state]
+        return [label for label, _ in options] if options is not None else ["Yes", "No"]
+
+    def answer(self, state, choice):
+        options = self.options[state]
+        if options is not None:
+            nxt = dict(options)[choice]
+        else:
+            nxt = self.yes[state] if choice == "Yes" else self.no[state]
+        if nxt < 0:
+            raise KeyError(f"{self.keys[state]!r} has no target node for answer {choice!r}")
+        return nxt
+
+    def likely_diagnoses(self, path, k=3):
+        # The leaf the path ended at is the only diagnosis consistent with it. The rest of the k are the
+        # nearest alternatives: the most likely leaves behind the branches not taken, from the last answer
+        # back, each with the node whose answer ruled it out. The precomputed per-node rankings make that
+        # O(path length * k); the alternatives are shown by likelihood
+        excluded = {}
+        for state, taken in reversed(list(zip(path, path[1:]))):
+            others = {leaf for dest in self.edges(state) if dest not in (taken, -1) for leaf in self.ranked[dest]}
+            others -= self.reachable[taken] | excluded.keys()
+            for leaf in sorted(others, key=lambda leaf: -self.leaves[leaf].likelihood)[:k - 1 - len(excluded)]:
+                excluded[leaf] = state
+            if len(excluded) == k - 1:
+                break
+        alternatives = sorted(excluded, key=lambda leaf: -self.leaves[leaf].likelihood)
+        return [(self.leaves[path[-1]], None)] + [(self.leaves[leaf], excluded[leaf]) for leaf in alternatives]
+
+
+@st.cache_resource
+def load_tree(version):
+    # version only keys the cache, so an edited decision_tree is compiled again
+    return CompiledTree(decision_tree)
+
+
+try:
+    tree = load_tree(hashlib.sha1(json.dumps(decision_tree, sort_keys=True).encode("utf-8")).hexdigest())
+except TreeError as e:
+    # refuse to serve a tree that would crash mid-session
+    st.error(str(e))
+    st.stop()
 
 # --- Initialize Session State ---
 if "step" not in st.session_state:
-    st.session_state.step = "start"
+    st.session_state.step = tree.start()
     st.session_state.history = []
     st.session_state.answers = []
     st.session_state.complete = False
@@ -326,8 +458,15 @@ if st.session_state.complete:
     st.markdown("""
 <h2 style='color: #2c3e50;'>🔎 Top Likely Diagnoses</h2>
 """, unsafe_allow_html=True)
-    top_diagnoses = get_likely_diagnoses(decision_tree)
-    for diagnosis, likelihood, treatment, prevention in top_diagnoses[:3]:
+    top_diagnoses = tree.likely_diagnoses(st.session_state.history + [st.session_state.step], k=3)
+    for leaf, ruled_out_at in top_diagnoses:
+        if ruled_out_at is not None:
+            st.markdown(
+                f"#### ❌ {leaf.diagnosis} ({leaf.likelihood}% likelihood) – ruled out by your answer to "
+                f"*{tree.question(ruled_out_at)}*"
+            )
+            continue
+        diagnosis, likelihood, treatment, prevention = leaf.diagnosis, leaf.likelihood, leaf.treatment, leaf.prevention
         diagnosis_images = {
             "Bovine Respiratory Disease (BRD)": "https://www.msdvetmanual.com/-/media/manual/veterinary/images/bovine-respiratory-disease-clinical-signs-steer.jpg",
             "Milk Fever (Hypocalcemia)": "https://www.researchgate.net/profile/Nurlan-Nazarov/publication/349726813/figure/fig1/AS:1004634454509579@1614841915276/Milk-fever-clinical-picture.png",
@@ -357,28 +496,26 @@ if st.session_state.complete:
 
 # --- Navigation Logic ---
 else:
-    node = decision_tree[st.session_state.step]
+    step = st.session_state.step
+    question = tree.question(step)
 
     with st.form(key="diagnosis_form"):
-        st.markdown(f"## {node['question']}")
+        st.markdown(f"## {question}")
 
-        if "options" in node:
-            user_input = st.radio("Select an option:", list(node["options"].keys()))
+        if tree.options[step] is not None:
+            user_input = st.radio("Select an option:", tree.choices(step))
         else:
-            user_input = st.radio("Select one:", ["Yes", "No"])
+            user_input = st.radio("Select one:", tree.choices(step))
 
         submitted = st.form_submit_button("Next")
 
         if submitted:
-            st.session_state.answers.append(f"{node['question']} → {user_input}")
-            st.session_state.history.append(st.session_state.step)
+            st.session_state.answers.append(f"{question} → {user_input}")
+            st.session_state.history.append(step)
 
-            if "options" in node:
-                next_step = node["options"][user_input]
-            else:
-                next_step = node["yes"] if user_input == "Yes" else node["no"]
+            next_step = tree.answer(step, user_input)
 
             st.session_state.step = next_step
-            if "diagnosis" in decision_tree.get(next_step, {}):
+            if tree.is_leaf(next_step):
                 st.session_state.complete = True
             st.rerun()
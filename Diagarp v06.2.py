@@ -1,4 +1,3 @@
-```python
 import streamlit as st
 import json
 import os
@@ -89,7 +88,7 @@ DISEASES = [
             {'question': 'Did fever precede nodule appearance?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
             {'question': 'Are nodules painful and 1–5 cm in size?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
             {'question': 'Have other cattle developed similar lumps?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
-            {'question': 'Is there tearing of eyes or nasal discharge?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+            {'question': 'Is there tearing of eyes or nasal discharge?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'eye_nasal_discharge'},
             {'question': 'Has the area had recent LSD outbreaks or new arrivals?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
         ]
     },
@@ -100,7 +99,7 @@ DISEASES = [
         'images': ['images/babesiosis_urine.jpg', 'images/blue_tick.jpg'],
         'criteria': [
             {'question': 'Have you observed red or dark urine?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
-            {'question': 'Does the cow have high fever (40–42°C)?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+            {'question': 'Does the cow have high fever (40–42°C)?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'high_fever'},
             {'question': 'Are eyes or gums pale or yellow?', 'options': ['Pale', 'Yellow', 'Normal'], 'positive': ['Pale', 'Yellow']},
             {'question': 'Is the cow weak or isolating from herd?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
             {'question': 'Are ticks present on the cow?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
@@ -113,7 +112,7 @@ DISEASES = [
         'summary': 'Tick-borne; anemia, fever, no red urine.',
         'images': ['images/anaplasmosis_jaundice.jpg'],
         'criteria': [
-            {'question': 'Does the cow have high fever (~41°C)?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+            {'question': 'Does the cow have high fever (~41°C)?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'high_fever'},
             {'question': 'Is the urine normal color (no redwater)?', 'options': ['Normal', 'Red'], 'positive': ['Normal']},
             {'question': 'Are mucous membranes pale or yellow?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
             {'question': 'Is the cow weak or breathless on exertion?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
@@ -129,9 +128,9 @@ DISEASES = [
         'criteria': [
             {'question': 'Are you in an ECF-endemic region?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
             {'question': 'Does the animal have swollen lymph nodes near the ear or shoulder?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
-            {'question': 'Is the fever very high and persistent?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+            {'question': 'Is the fever very high and persistent?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'high_fever'},
             {'question': 'Has the animal developed breathing difficulty?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
-            {'question': 'Is there tearing of eyes or nasal discharge?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+            {'question': 'Is there tearing of eyes or nasal discharge?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'eye_nasal_discharge'},
             {'question': 'Are brown ear ticks visible on the animal?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
         ]
     },
@@ -179,19 +178,52 @@ DISEASES = [
     }
 ]
 
+# Signs several diseases ask about, worded once so the shared question fits each of them
+SYMPTOMS = {
+    'high_fever': 'Does the cow have a high fever (above 40°C)?',
+    'eye_nasal_discharge': 'Is there tearing of eyes or nasal discharge?',
+}
+
+# Inverted index, built once at load: symptom ID (a criterion's 'symptom' tag, else its question) ->
+# the question asked once plus each disease that uses it with its own criterion
+def build_symptom_index(diseases):
+    index = {}
+    for d in diseases:
+        for c in d['criteria']:
+            sid = c.get('symptom', c['question'])
+            question = SYMPTOMS[sid] if 'symptom' in c else c['question']
+            entry = index.setdefault(sid, {'question': question, 'options': c['options'], 'diseases': {}})
+            if entry['options'] != c['options']:
+                raise ValueError(f"Symptom {sid!r} has different options in {d['key']}")
+            entry['diseases'][d['key']] = c
+    return index
+
+SYMPTOM_INDEX = build_symptom_index(DISEASES)
+
 # Streamlit diagnostic UI functions
 
-def run_diagnosis_for(disease):
-    st.subheader(disease['name'])
-    responses = {}
-    match = True
-    for c in disease['criteria']:
-        choice = st.radio(c['question'], c['options'], key=disease['key']+c['question'])
-        responses[c['question']] = choice
-        if choice not in c['positive']:
-            match = False
-    log_symptoms(disease['key'], responses)
-    return match
+# One form over the distinct symptoms of the chosen diseases; each answer is dispatched
+# straight to the diseases that share it. Returns the matching diseases, or None until submitted
+def run_screening(keys):
+    symptoms = [(sid, s) for sid, s in SYMPTOM_INDEX.items() if keys.intersection(s['diseases'])]
+    with st.form('screening'):
+        answers = {sid: st.radio(s['question'], s['options'], key=sid) for sid, s in symptoms}
+        submitted = st.form_submit_button("Run Diagnosis")
+    if not submitted:
+        return None
+    responses = {key: {} for key in keys}
+    failed = set()
+    for sid, s in symptoms:
+        for key, c in s['diseases'].items():
+            if key in keys:
+                # logged under the question the farmer was actually shown
+                responses[key][s['question']] = answers[sid]
+                if answers[sid] not in c['positive']:
+                    failed.add(key)
+    for d in DISEASES:
+        if d['key'] in keys:
+            log_symptoms(d['key'], responses[d['key']])
+    return [d for d in DISEASES if d['key'] in keys and d['key'] not in failed]
 
 # Main App
 
@@ -205,12 +237,9 @@ def main():
     selected = st.multiselect("Pick diseases to check (or leave blank to check all):",
                               [d['name'] for d in DISEASES], default=None)
 
-    if st.button("Run Diagnosis"):
-        results = []
-        for disease in DISEASES:
-            if not selected or disease['name'] in selected:
-                if run_diagnosis_for(disease):
-                    results.append(disease)
+    keys = {d['key'] for d in DISEASES if not selected or d['name'] in selected}
+    results = run_screening(keys)
+    if results is not None:
         if results:
             # Show first match
             diag = results[0]
@@ -224,4 +253,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-```
@@ -1,6 +1,38 @@
 import streamlit as st
+import numpy as np
+import argparse
+import atexit
+import hashlib
 import json
+import logging
+import marshal
+import math
 import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from types import MappingProxyType
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, run a single worker process
+    fcntl = None
+
+logger = logging.getLogger('diagarp')
+
+try:
+    import redis
+except ImportError:  # only needed for SESSION_STORE = 'redis'
+    redis = None
 
 # --- Localization & Media Support ---
 
@@ -16,14 +48,66 @@ def load_translations():
             'Likely diagnosis:': 'Hasashen cuta:',
             'Symptoms do not fully match. Please consult a veterinarian.': 'Alamomin ba su dace sosai ba. Da fatan za a tuntubi likitan dabbobi.',
             'Restart': 'Fara Sake',
+            'Yes': 'Eh',
+            'No': "A'a",
+            'Not sure': 'Ban tabbata ba',
         }
     }
 
+def _catalog_stamp(lang):
+    try:
+        info = os.stat(os.path.join(TRANSLATIONS_DIR, f'{lang}.json'))
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+def catalog_stamps(lang):
+    return tuple(_catalog_stamp(code) for code in (lang,) + LANG_FALLBACKS.get(lang, ()))
+
+def _read_catalog_file(lang):
+    # External catalog for lang, parsed once and then served from a marshal cache until the JSON changes
+    path = os.path.join(TRANSLATIONS_DIR, f'{lang}.json')
+    stamp = _catalog_stamp(lang)
+    if stamp is None:
+        return {}
+    cache = path + '.bin'
+    try:
+        with open(cache, 'rb') as f:
+            cached_stamp, entries = marshal.load(f)
+        if cached_stamp == stamp:
+            return entries
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    try:
+        _write_atomic(cache, marshal.dumps((stamp, entries)))
+    except OSError:  # read-only install: keep the parsed catalog
+        pass
+    return entries
+
+@st.cache_resource
+def compile_catalog(lang, stamps):
+    # One read-only table per language with its fallback chain merged in, compiled on first use and shared
+    # by every session thread; external catalog entries override the built-in ones. `stamps` only keys the
+    # cache, so an edited catalog file is compiled again
+    merged = {}
+    for code in reversed((lang,) + LANG_FALLBACKS.get(lang, ())):
+        merged.update(load_translations().get(code, {}))
+        merged.update(_read_catalog_file(code))
+    return MappingProxyType(merged)
+
+def catalog(lang):
+    return compile_catalog(lang, catalog_stamps(lang))
+
 def t(text: str) -> str:
-    lang = st.session_state.get('lang', 'en')
-    return load_translations().get(lang, {}).get(text, text)
+    return catalog(st.session_state.get('lang', 'en')).get(text, text)
 
 # --- Configuration ---
+# Optional external translation catalogs, one flat {source text: translation} JSON object per language
+# (translations/ha.json, ...), and the languages tried after the requested one before the source text
+TRANSLATIONS_DIR = 'translations'
+LANG_FALLBACKS = {'ha': ('en',)}
 EMERGENCY_VET_CONTACT = {
     'Nigeria': '+234XXXXXXXXXX',
     'Kenya': '+254XXXXXXXXX',
@@ -31,6 +115,75 @@ EMERGENCY_VET_CONTACT = {
     'Other': 'N/A'
 }
 LOG_FILE = 'symptom_logs.json'
+# Case log backend: 'json' rewrites the legacy array in LOG_FILE, 'jsonl' appends one record per line,
+# 'sqlite' inserts into an indexed table in LOG_DB
+LOG_BACKEND = 'jsonl'
+CASE_LOG_FILE = 'symptom_logs.jsonl'
+LOG_DB = 'symptom_logs.db'
+# Copies of every knowledge base version cases were logged against, used to decode compact records
+KB_SNAPSHOT_DIR = 'kb_versions'
+# fsync policy for the jsonl log: 'always', 'interval' (at most once per LOG_FSYNC_INTERVAL s) or 'never'
+LOG_FSYNC = 'interval'
+LOG_FSYNC_INTERVAL = 1.0
+# The jsonl log rotates into zlib-compressed segments once it passes LOG_SEGMENT_MAX_BYTES or the UTC day
+# changes; LOG_MANIFEST records each closed segment's time range so readers can skip it
+LOG_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+LOG_ROTATE_DAILY = True
+LOG_MANIFEST = 'symptom_logs.manifest.json'
+# Background writer: log_symptoms only enqueues; batches commit at LOG_BATCH_SIZE records or LOG_BATCH_INTERVAL s
+LOG_ASYNC = True
+LOG_BATCH_SIZE = 64
+LOG_BATCH_INTERVAL = 0.5
+# A failed batch write is retried LOG_WRITE_RETRIES times with doubling delays from LOG_RETRY_DELAY s; if it
+# still fails the records are kept and go out with the next batch
+LOG_WRITE_RETRIES = 3
+LOG_RETRY_DELAY = 0.5
+# How many recent case IDs each process remembers to drop repeat logs of the same case
+LOG_DEDUP_WINDOW = 100_000
+# Multi-disease screen question order: 'info_gain' asks the criterion that best separates the remaining
+# candidates, 'policy' looks the next question up in the table compiled into SCREEN_POLICY_FILE (falling back
+# to info_gain for states it does not cover), 'fixed' follows DISEASES order. The SIGN_* rates are
+# P(positive answer | disease) used to estimate information gain for criteria a disease does / does not list.
+SCREEN_ORDER = 'info_gain'
+SCREEN_POLICY_FILE = 'screen_policy.json'
+SIGN_PRESENT_RATE = 0.9
+SIGN_BACKGROUND_RATE = 0.1
+# Verdict rule: 'strict' needs every criterion positive; 'weighted' sums per-option log likelihood ratios
+# (a criterion may set its own under 'lr') and matches once the posterior reaches WEIGHTED_MATCH_CONFIDENCE,
+# so an uncertain answer lowers confidence instead of ending the case
+SCORING = 'strict'
+UNCERTAIN_OPTIONS = ('Not sure', 'Unknown', 'Not checked', 'Not observed')
+POSITIVE_LR = 4.0
+NEGATIVE_LR = 0.05
+PRIOR_ODDS = 1.0
+WEIGHTED_MATCH_CONFIDENCE = 0.95
+# Answer prefixes whose next question, progress and verdict are kept in the process-wide prefix cache
+PREFIX_CACHE_SIZE = 50_000
+# Mirror each case step into the URL query string (KB hash, stage, disease ID, answer bitset / screen path) and
+# rebuild a fresh session from it, so any worker can serve the next step and a crashed worker's case resumes
+URL_STATE = False
+# Server-side case checkpoints: None, 'memory' (per-process LRU of SESSION_STORE_SIZE cases), 'sqlite'
+# (SESSION_DB, shared by workers on one host) or 'redis' (any Redis-compatible server at SESSION_REDIS_URL).
+# Each answer checkpoints the case; cases untouched for SESSION_TTL seconds are evicted, and an unfinished
+# case can be resumed from its case ID.
+SESSION_STORE = None
+SESSION_TTL = 24 * 3600
+SESSION_STORE_SIZE = 10_000
+SESSION_DB = 'sessions.db'
+SESSION_REDIS_URL = 'redis://localhost:6379/0'
+
+# --- Symptom Registry ---
+# Canonical clinical signs shared across diseases; a criterion names one with 'symptom' so a multi-disease
+# screen asks it once. The registry ID of a sign is its position.
+SYMPTOMS = [
+    {'key': 'fever', 'question': 'Does the cow have a high fever?', 'options': ['Yes','No']},
+    {'key': 'pale_membranes', 'question': 'Are the eyes, gums or other mucous membranes pale?', 'options': ['Yes','No']},
+    {'key': 'nasal_discharge', 'question': 'Is there nasal discharge or tearing of the eyes?', 'options': ['Yes','No']},
+    {'key': 'swollen_nodes', 'question': 'Are the lymph nodes visibly swollen?', 'options': ['Yes','No']},
+    {'key': 'weakness', 'question': 'Is the cow weak or lethargic?', 'options': ['Yes','No']},
+    {'key': 'herd_spread', 'question': 'Have other animals in the herd shown the same signs?', 'options': ['Yes','No']},
+    {'key': 'new_animals', 'question': 'Were new animals recently brought into the herd?', 'options': ['Yes','No']},
+]
 
 # --- Disease Data ---
 DISEASES = [
@@ -43,8 +196,8 @@ DISEASES = [
             {'question': 'Is the cow drooling or foaming at the mouth?', 'options': ['Yes','No'], 'positive': ['Yes']},
             {'question': 'Do you see blisters or raw ulcers in the cow’s mouth?', 'options': ['Yes','No'], 'positive': ['Yes']},
             {'question': 'Is the cow lame or reluctant to move due to hoof lesions?', 'options': ['Yes','No'], 'positive': ['Yes']},
-            {'question': 'Have multiple animals shown these signs at the same time?', 'options': ['Yes','No'], 'positive': ['Yes']},
-            {'question': 'Was there recent movement of animals into the herd?', 'options': ['Yes','No'], 'positive': ['Yes']}
+            {'question': 'Have multiple animals shown these signs at the same time?', 'options': ['Yes','No'], 'positive': ['Yes'], 'symptom': 'herd_spread'},
+            {'question': 'Was there recent movement of animals into the herd?', 'options': ['Yes','No'], 'positive': ['Yes'], 'symptom': 'new_animals'}
         ]
     },
     # ... other diseases defined similarly ...
@@ -53,37 +206,1407 @@ SYMPTOM_MAP = {
     'Drooling & blisters': 'fmd',
     # ... map other symptoms ...
 }
+# Primary-symptom choice that screens every disease at once instead of following one
+SCREEN_CHOICE = 'Not sure - check all diseases'
+# Identifies the knowledge base a logged case was answered against; SYMPTOMS is included because screen
+# sign IDs follow its order
+KB_VERSION = hashlib.sha1(json.dumps([DISEASES, SYMPTOMS], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+# --- Compact Case Records ---
+# A logged case is (kb, d, m, a): KB_VERSION, the disease's index in DISEASES, whether it matched, and one
+# answer code per criterion (option index, -1 if not asked). IDs are positions, pinned by the KB hash.
+def compile_kb_ids(diseases):
+    questions = {}
+    for i, d in enumerate(diseases):
+        for j, c in enumerate(d['criteria']):
+            questions.setdefault(c['question'], (i, j))
+    return {
+        'disease': {d['key']: i for i, d in enumerate(diseases)},
+        'criterion': [{c['question']: j for j, c in enumerate(d['criteria'])} for d in diseases],
+        'question': questions,
+    }
+
+KB_IDS = compile_kb_ids(DISEASES)
+
+def encode_answers(disease_id, responses):
+    criteria = DISEASES[disease_id]['criteria']
+    ids = KB_IDS['criterion'][disease_id]
+    codes = [-1] * len(criteria)
+    for r in responses:
+        j = ids[r['question']]
+        codes[j] = criteria[j]['options'].index(r['answer'])
+    while codes and codes[-1] == -1:
+        codes.pop()
+    return codes
+
+def compact_record(record, checked=None):
+    # Re-encodes a verbose {'disease', 'responses'} record against the current KB; records whose
+    # questions are not in this KB stay verbose. `checked` names the disease a non-matching record was
+    # checked against, when the caller knows it
+    if 'a' in record:
+        return record
+    try:
+        if record['disease'] != 'none':
+            disease_id = KB_IDS['disease'][record['disease']]
+        elif checked in KB_IDS['disease']:
+            disease_id = KB_IDS['disease'][checked]
+        elif record['responses']:
+            disease_id = KB_IDS['question'][record['responses'][0]['question']][0]
+        else:
+            return record
+        codes = encode_answers(disease_id, record['responses'])
+    except (KeyError, ValueError):
+        return record
+    meta = {k: v for k, v in record.items() if k not in ('disease', 'responses')}
+    return dict(meta, kb=KB_VERSION, d=disease_id, m=int(record['disease'] != 'none'), a=codes)
+
+def save_kb_snapshot():
+    path = os.path.join(KB_SNAPSHOT_DIR, KB_VERSION + '.json')
+    if not os.path.exists(path):
+        os.makedirs(KB_SNAPSHOT_DIR, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(DISEASES, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+@lru_cache(maxsize=None)
+def load_kb(kb_version):
+    if kb_version == KB_VERSION:
+        return DISEASES
+    with open(os.path.join(KB_SNAPSHOT_DIR, kb_version + '.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+def case_disease_key(record):
+    if 'a' not in record:
+        return record['disease']
+    return load_kb(record['kb'])[record['d']]['key'] if record['m'] else 'none'
+
+def decode_case(record):
+    # Rebuilds the human-readable {'disease', 'responses'} form of a compact record
+    if 'a' not in record:
+        return record
+    criteria = load_kb(record['kb'])[record['d']]['criteria']
+    meta = {k: v for k, v in record.items() if k not in ('d', 'm', 'a')}
+    responses = [
+        {'question': criteria[j]['question'], 'answer': criteria[j]['options'][code]}
+        for j, code in enumerate(record['a']) if code >= 0
+    ]
+    return dict(meta, disease=case_disease_key(record), responses=responses)
+
+# --- Differential Scoring ---
+# DISEASES compiled into a disease x sign matrix, so one answer vector (option index per sign, -1 if
+# unanswered) scores every disease in a single pass instead of walking one criteria list at a time.
+# Signs are the SYMPTOMS entries criteria name with 'symptom', plus one per distinct unnamed criterion, so a
+# sign several diseases share is asked and stored once and counts towards each of them.
+def compile_signs(diseases, symptoms):
+    signs = [dict(sym, options=list(sym['options'])) for sym in symptoms]
+    index = {sym['key']: i for i, sym in enumerate(symptoms)}
+    crit_sign = []
+    for d in diseases:
+        row = []
+        for crit in d['criteria']:
+            key = crit.get('symptom') or (crit['question'], tuple(crit['options']))
+            if key not in index:
+                index[key] = len(signs)
+                signs.append({'key': key, 'question': crit['question'], 'options': list(crit['options'])})
+            if signs[index[key]]['options'] != crit['options']:
+                raise ValueError(f"{d['key']}: options of {crit['question']!r} differ from sign {key!r}")
+            row.append(index[key])
+        crit_sign.append(row)
+    # only signs some disease uses become columns
+    used = sorted({i for row in crit_sign for i in row})
+    remap = {old: new for new, old in enumerate(used)}
+    return [signs[i] for i in used], [[remap[i] for i in row] for row in crit_sign]
+
+class Scorer:
+    def __init__(self, diseases, symptoms=(), mode='strict'):
+        self.mode = mode
+        self.columns, self.crit_col = compile_signs(diseases, symptoms)
+        n_options = max(len(sign['options']) for sign in self.columns)
+        self.positive = np.zeros((len(diseases), len(self.columns), n_options), dtype=bool)
+        self.weight = np.zeros((len(diseases), len(self.columns)))
+        self.log_lr = np.zeros((len(diseases), len(self.columns), n_options))
+        for i, d in enumerate(diseases):
+            for crit, c in zip(d['criteria'], self.crit_col[i]):
+                self.positive[i, c, [crit['options'].index(o) for o in crit['positive']]] = True
+                self.weight[i, c] = crit.get('weight', 1.0)
+                lr = crit.get('lr', {})
+                for k, o in enumerate(crit['options']):
+                    default = 1.0 if o in UNCERTAIN_OPTIONS else POSITIVE_LR if o in crit['positive'] else NEGATIVE_LR
+                    self.log_lr[i, c, k] = np.log(lr.get(o, default))
+        self.uncertain = np.zeros((len(self.columns), n_options), dtype=bool)
+        for c, sign in enumerate(self.columns):
+            self.uncertain[c, [k for k, o in enumerate(sign['options']) if o in UNCERTAIN_OPTIONS]] = True
+        # an answer counts as positive for a sign if any disease listing it treats it so
+        self.sign_positive = self.positive.any(axis=0)
+        self.total = self.weight.sum(axis=1)
+        self.expect = np.where(self.weight > 0, SIGN_PRESENT_RATE, SIGN_BACKGROUND_RATE)
+        # most evidence each open criterion could still add, to tell when a disease can no longer match
+        self.max_log_lr = self.log_lr.max(axis=2)
+        # how each disease reads every option, as update() scores it
+        self.observed = np.where(self.weight[:, :, None] > 0, self.positive, self.sign_positive[None])
+        # options that leave the same scoring state share an outcome, named by its first option; two
+        # diseases reading one sign in opposite ways give it two outcomes with nothing shared
+        self.outcome = np.zeros((len(self.columns), n_options), dtype=int)
+        for c, sign in enumerate(self.columns):
+            seen = {}
+            for k in range(len(sign['options'])):
+                effect = (self.positive[:, c, k].tobytes(), self.log_lr[:, c, k].tobytes(), self.sign_positive[c, k],
+                          self.uncertain[c, k])
+                self.outcome[c, k] = seen.setdefault(effect, k)
+        self.prior = np.log(PRIOR_ODDS)
+        self.threshold = np.log(WEIGHTED_MATCH_CONFIDENCE / (1 - WEIGHTED_MATCH_CONFIDENCE))
+
+    def empty(self):
+        return [-1] * len(self.columns)
+
+    def start(self):
+        n = len(self.total)
+        return Evidence(np.zeros(n), np.zeros(n), np.full(n, self.prior), self.max_log_lr.sum(axis=1), np.zeros(n))
+
+    def update(self, evidence, col, code):
+        # Fold one answered sign into the running per-disease state, O(#diseases)
+        hit = self.positive[:, col, code]
+        observed = np.where(self.weight[:, col] > 0, hit, self.sign_positive[col, code])
+        expect = self.expect[:, col]
+        # uncertain answers carry no evidence for the screening posterior
+        lik = 0.0 if self.uncertain[col, code] else np.where(observed, np.log(expect), np.log1p(-expect))
+        return Evidence(
+            evidence.hits + self.weight[:, col] * hit, evidence.misses + self.weight[:, col] * ~hit,
+            evidence.log_odds + self.log_lr[:, col, code], evidence.headroom - self.max_log_lr[:, col],
+            evidence.log_lik + lik)
+
+    def rescan(self, answers):
+        # The same state recomputed from every answer at once; only the tests use it, to check update()
+        answers = np.asarray(answers)
+        answered = answers >= 0
+        cols, codes = np.arange(len(answers)), np.where(answered, answers, 0)
+        hit = self.positive[:, cols, codes] & answered
+        observed = np.where(self.weight > 0, hit, self.sign_positive[cols, codes])
+        counted = answered & ~self.uncertain[cols, codes]
+        lik = np.where(observed, np.log(self.expect), np.log1p(-self.expect))
+        return Evidence(
+            (self.weight * hit).sum(axis=1), (self.weight * (answered & ~hit)).sum(axis=1),
+            self.prior + (self.log_lr[:, cols, codes] * answered).sum(axis=1), self.max_log_lr @ ~answered,
+            (lik * counted).sum(axis=1))
+
+    def differential(self, answers, evidence):
+        # strict: diseases with no failed criterion first, then by weighted fraction of criteria matched;
+        # weighted: by posterior confidence
+        hits, misses, log_odds = evidence.hits, evidence.misses, evidence.log_odds
+        answered = hits + misses
+        fraction = hits / self.total
+        confidence = 1 / (1 + np.exp(-log_odds))
+        if self.mode == 'weighted':
+            order = np.argsort(-log_odds, kind='stable')
+            match = log_odds >= self.threshold
+        else:
+            order = np.lexsort((-fraction, misses > 0))
+            match = (misses == 0) & (answered == self.total)
+        return [
+            {'disease': int(i), 'fraction': float(fraction[i]), 'hits': float(hits[i]), 'misses': float(misses[i]),
+             'answered': float(answered[i]), 'total': float(self.total[i]), 'confidence': float(confidence[i]),
+             'match': bool(match[i])}
+            for i in order
+        ]
+
+    def can_match(self, evidence):
+        # strict: no failed criterion yet; weighted: could still reach the threshold if every open
+        # criterion came back at its strongest
+        if self.mode == 'weighted':
+            return evidence.log_odds + evidence.headroom >= self.threshold
+        return evidence.misses == 0
+
+    def remaining(self, answers, evidence):
+        # Unanswered signs of diseases that are still candidates
+        return np.flatnonzero(self.weight[self.can_match(evidence)].any(axis=0) & (np.asarray(answers) < 0))
+
+    def confidence(self, evidence, disease_id):
+        return float(1 / (1 + np.exp(-evidence.log_odds[disease_id])))
+
+    def disease_answers(self, disease_id, answers):
+        # Per-criterion answer codes of one disease, read from the shared sign answers
+        return [answers[c] for c in self.crit_col[disease_id]]
+
+    def state_key(self, answers):
+        # Answer prefix reduced to what scoring depends on: the outcome of each answered sign
+        return ','.join(str(self.outcome[c, a]) if a >= 0 else '' for c, a in enumerate(answers))
+
+    def outcomes(self, col):
+        # The distinct outcomes of answering col, one representative option each; uncertain answers carry
+        # no evidence, so a policy does not plan for them
+        codes = self.outcome[col, :len(self.columns[col]['options'])]
+        return [int(k) for k in np.unique(codes) if not self.uncertain[col, k]]
+
+    def state_count(self):
+        # Upper bound on distinct state keys: each sign unanswered or at one of its outcomes
+        return math.prod(1 + len(self.outcomes(c)) for c in range(len(self.columns)))
+
+    def next_column(self, answers, evidence, order='fixed'):
+        remaining = self.remaining(answers, evidence)
+        if not remaining.size:
+            return None
+        if order == 'policy':
+            col = get_screen_policy().get(self.state_key(answers))
+            # a table compiled before can still name a question that is already answered or moot
+            if col is not None and col in remaining:
+                return col
+            order = 'info_gain'
+        if order == 'info_gain':
+            return int(remaining[np.argmax(self.information_gain(evidence, remaining))])
+        return int(remaining[0])
+
+    def _posterior(self, evidence):
+        candidates = self.can_match(evidence)
+        log_p = evidence.log_lik[candidates]
+        p = np.exp(log_p - log_p.max())
+        return self.expect[candidates], p / p.sum()
+
+    def information_gain(self, evidence, columns):
+        # Expected entropy reduction over the candidate diseases for asking each of columns
+        expect, p = self._posterior(evidence)
+        e = expect[:, columns]
+        p_yes = p @ e
+        post_yes = p[:, None] * e / np.maximum(p_yes, 1e-12)
+        post_no = p[:, None] * (1 - e) / np.maximum(1 - p_yes, 1e-12)
+        return _entropy(p) - p_yes * _entropy(post_yes) - (1 - p_yes) * _entropy(post_no)
+
+    def outcome_probabilities(self, evidence, col, codes):
+        # P(each of codes as the answer to col) under the current posterior over candidates
+        expect, p = self._posterior(evidence)
+        seen = self.observed[self.can_match(evidence)][:, col, codes]
+        e = expect[:, col, None]
+        lik = p @ np.where(seen, e, 1 - e)
+        return lik / lik.sum()
+
+class Evidence:
+    # Running per-disease scoring state: weighted hits and misses, verdict log-odds, the most log-odds
+    # the open criteria could still add, and the screening log-likelihood
+    __slots__ = ('hits', 'misses', 'log_odds', 'headroom', 'log_lik')
+
+    def __init__(self, hits, misses, log_odds, headroom, log_lik):
+        self.hits, self.misses, self.log_odds, self.headroom, self.log_lik = hits, misses, log_odds, headroom, log_lik
+
+def _entropy(p):
+    p = np.clip(p, 1e-12, 1.0)
+    return -(p * np.log2(p)).sum(axis=0)
+
+@st.cache_resource
+def get_scorer():
+    return Scorer(DISEASES, SYMPTOMS, SCORING)
+
+# --- Offline Screening Policy ---
+# Dynamic programming over answer prefixes: the cost of a state is the expected number of questions still
+# to ask. A KB with at most max_states states (Scorer.state_count) is searched exhaustively and the table
+# is the optimal policy. Larger KBs use a heuristic instead: only the `beam` most informative next criteria
+# are tried and the search looks `horizon` answers ahead, with the unanswered candidate criteria count
+# standing in past it, so the table is not guaranteed optimal.
+# The policy is then unrolled from the empty state into a {state_key: column} table so the app does one
+# dict lookup per step.
+def compile_policy(scorer, beam=3, horizon=2, max_states=50_000):
+    if scorer.state_count() <= max_states:
+        beam = horizon = None
+    memo = {}
+
+    def child(answers, evidence, col, code):
+        nxt = list(answers)
+        nxt[col] = code
+        return nxt, scorer.update(evidence, col, code)
+
+    def cost(answers, evidence, depth):
+        remaining = scorer.remaining(answers, evidence)
+        if not remaining.size:
+            return 0.0, None
+        if depth == horizon:
+            return float(remaining.size), None
+        # an exact cost does not depend on how deep the state was reached
+        key = (scorer.state_key(answers), depth if horizon is not None else None)
+        if key not in memo:
+            gains = scorer.information_gain(evidence, remaining)
+            best = (float('inf'), None)
+            for col in remaining[np.argsort(-gains, kind='stable')[:beam]]:
+                col = int(col)
+                codes = scorer.outcomes(col)
+                value = 1.0
+                for code, p in zip(codes, scorer.outcome_probabilities(evidence, col, codes)):
+                    if p > 0:
+                        value += p * cost(*child(answers, evidence, col, code), depth + 1)[0]
+                best = min(best, (value, col))
+            memo[key] = best
+        return memo[key]
+
+    table = {}
+    frontier = [(scorer.empty(), scorer.start())]
+    while frontier and len(table) < max_states:
+        answers, evidence = frontier.pop()
+        key = scorer.state_key(answers)
+        if key in table:
+            continue
+        _, col = cost(answers, evidence, 0)
+        if col is None:
+            continue
+        table[key] = col
+        frontier += [child(answers, evidence, col, code) for code in scorer.outcomes(col)]
+        if len(memo) > 4 * max_states:
+            memo.clear()
+    return table
+
+def policy_settings():
+    # Everything besides the KB a compiled table depends on
+    return {'scoring': SCORING, 'sign_rates': [SIGN_PRESENT_RATE, SIGN_BACKGROUND_RATE],
+            'lr': [POSITIVE_LR, NEGATIVE_LR, PRIOR_ODDS, WEIGHTED_MATCH_CONFIDENCE]}
+
+def save_policy(table, path=SCREEN_POLICY_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'kb': KB_VERSION, 'settings': policy_settings(), 'table': table}, f, separators=(',', ':'))
+
+@st.cache_resource
+def get_screen_policy():
+    # A table compiled for another KB version or other scoring settings would point at the wrong criteria,
+    # so it is ignored
+    if not os.path.exists(SCREEN_POLICY_FILE):
+        return {}
+    with open(SCREEN_POLICY_FILE, encoding='utf-8') as f:
+        policy = json.load(f)
+    if policy.get('kb') != KB_VERSION or policy.get('settings') != policy_settings():
+        return {}
+    return policy['table']
+
+def compile_policy_cli(argv):
+    parser = argparse.ArgumentParser(prog='compile-policy', description='Precompute the multi-disease screening policy')
+    parser.add_argument('--out', default=SCREEN_POLICY_FILE)
+    parser.add_argument('--beam', type=int, default=3)
+    parser.add_argument('--horizon', type=int, default=2)
+    parser.add_argument('--max-states', type=int, default=50_000)
+    args = parser.parse_args(argv)
+    scorer = Scorer(DISEASES, SYMPTOMS, SCORING)
+    table = compile_policy(scorer, args.beam, args.horizon, args.max_states)
+    save_policy(table, args.out)
+    search = 'exact' if scorer.state_count() <= args.max_states else f'beam {args.beam}, horizon {args.horizon}'
+    print(f'Wrote {len(table)} policy states ({search}) for KB {KB_VERSION} to {args.out}')
+
+# --- Answer Bitsets ---
+# A disease's answers as two ints: `bits` holds the answers in fixed-width fields (one bit for a yes/no
+# criterion with exactly one positive option, set = first option; one-hot for the rest) and `asked` holds
+# the lowest bit of every answered field. The positive pattern is precompiled into masks, so matching,
+# partial-match counts and the failed criteria come from a couple of bitwise ops and a popcount.
+class AnswerBits:
+    def __init__(self, criteria):
+        self.offsets, self.widths, self.field_of = [], [], {}
+        pos = yes_no = positive = negative = fields = 0
+        for j, crit in enumerate(criteria):
+            options = crit['options']
+            flags = [o in crit['positive'] for o in options]
+            width = 1 if len(options) == 2 and flags[0] != flags[1] else len(options)
+            self.offsets.append(pos)
+            self.widths.append(width)
+            fields |= 1 << pos
+            if width == 1:
+                yes_no |= 1 << pos
+                positive |= int(flags[0]) << pos
+            else:
+                for k, flag in enumerate(flags):
+                    negative |= int(not flag) << (pos + k)
+            for k in range(width):
+                self.field_of[pos + k] = j
+            pos += width
+        self.width = pos
+        self.yes_no, self.positive, self.negative, self.fields = yes_no, positive, negative, fields
+
+    def set(self, asked, bits, j, code):
+        off, width = self.offsets[j], self.widths[j]
+        bits &= ~(((1 << width) - 1) << off)
+        bits |= (int(code == 0) << off) if width == 1 else (1 << (off + code))
+        return asked | (1 << off), bits
+
+    def decode(self, asked, bits):
+        # Back to one option index per criterion, -1 if unanswered
+        codes = []
+        for off, width in zip(self.offsets, self.widths):
+            if not asked >> off & 1:
+                codes.append(-1)
+            elif width == 1:
+                codes.append(0 if bits >> off & 1 else 1)
+            else:
+                codes.append(((bits >> off) & ((1 << width) - 1)).bit_length() - 1)
+        return codes
+
+    def failed(self, asked, bits):
+        return ((bits ^ self.positive) & asked & self.yes_no) | (bits & self.negative)
+
+    def match(self, asked, bits):
+        return asked == self.fields and not self.failed(asked, bits)
+
+    def counts(self, asked, bits):
+        # (matched, failed, answered) criteria
+        failed = self.failed(asked, bits).bit_count()
+        answered = asked.bit_count()
+        return answered - failed, failed, answered
+
+    def failed_criteria(self, asked, bits):
+        failed, out = self.failed(asked, bits), []
+        while failed:
+            low = failed & -failed
+            out.append(self.field_of[low.bit_length() - 1])
+            failed ^= low
+        return out
+
+    @staticmethod
+    def pack(asked, bits):
+        return f'{asked:x}.{bits:x}'
+
+    @staticmethod
+    def unpack(text):
+        asked, bits = text.split('.')
+        return int(asked, 16), int(bits, 16)
+
+# --- Compiled Knowledge Base ---
+# DISEASES frozen once per process together with the lookups the pages need, so a session holds only the
+# disease ID, question index and answer bitsets instead of its own copy of the disease dict.
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+class CompiledKB:
+    def __init__(self, diseases, symptom_map):
+        self.version = KB_VERSION
+        self.diseases = _freeze(diseases)
+        self.disease_id = MappingProxyType({d['key']: i for i, d in enumerate(diseases)})
+        self.primary = MappingProxyType({label: self.disease_id[key] for label, key in symptom_map.items()})
+        self.layouts = tuple(AnswerBits(d['criteria']) for d in diseases)
+
+    def criterion(self, disease_id, j):
+        return self.diseases[disease_id]['criteria'][j]
+
+    def codes(self, disease_id, asked, bits):
+        return self.layouts[disease_id].decode(asked, bits)
+
+@st.cache_resource
+def get_kb():
+    return CompiledKB(DISEASES, SYMPTOM_MAP)
+
+# --- Answer Prefix Cache ---
+# A trie over answer prefixes - KB version, flow, then each answer code in the order asked - holding what
+# every session on that path would otherwise recompute. Least recently used entries are evicted.
+class _PrefixNode:
+    __slots__ = ('parent', 'edge', 'children', 'value')
+
+    def __init__(self, parent=None, edge=None):
+        self.parent, self.edge, self.children, self.value = parent, edge, {}, None
+
+class PrefixCache:
+    def __init__(self, size):
+        self._size = size
+        self._root = _PrefixNode()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def lookup(self, path, compute):
+        with self._lock:
+            node = self._root
+            for edge in path:
+                node = node.children.get(edge)
+                if node is None:
+                    break
+            if node is not None and node in self._lru:
+                self._lru.move_to_end(node)
+                self._stats['hits'] += 1
+                return node.value
+            self._stats['misses'] += 1
+        # computed outside the lock; two sessions racing on a new prefix both compute and one result is kept
+        value = compute()
+        with self._lock:
+            node = self._root
+            for edge in path:
+                node = node.children.setdefault(edge, _PrefixNode(node, edge))
+            node.value = value
+            self._lru[node] = None
+            self._lru.move_to_end(node)
+            while len(self._lru) > self._size:
+                self._evict(self._lru.popitem(last=False)[0])
+        return value
+
+    def _evict(self, node):
+        self._stats['evictions'] += 1
+        node.value = None
+        # prune branches left with no cached value below them
+        while node.parent is not None and not node.children and node not in self._lru:
+            del node.parent.children[node.edge]
+            node = node.parent
+
+    def metrics(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, entries=len(self._lru), hit_rate=self._stats['hits'] / lookups if lookups else 0.0)
+
+@st.cache_resource
+def get_prefix_cache():
+    return PrefixCache(PREFIX_CACHE_SIZE)
+
+# --- Question Cards ---
+# Every KB string has a message ID - 'fmd.name', 'fmd.summary', 'fmd.2.question', 'fmd.2.option.1',
+# 'symptom.fever.question' - and a catalog may translate it by ID or by its English text. Each language gets
+# one bundle of fully rendered cards, so a page fetches a single ready object per (criterion, language).
+class QuestionCard:
+    __slots__ = ('question', 'options')
+
+    def __init__(self, question, options):
+        self.question, self.options = question, options
+
+def _translate(table, msg_id, text):
+    return table.get(msg_id) or table.get(text, text)
+
+def _render_card(table, msg_id, source):
+    return QuestionCard(
+        _translate(table, f'{msg_id}.question', source['question']),
+        tuple(_translate(table, f'{msg_id}.option.{k}', o) for k, o in enumerate(source['options'])))
+
+def _sign_msg_id(sign):
+    if isinstance(sign['key'], str):
+        return f"symptom.{sign['key']}"
+    # a sign only one criterion asks keeps that criterion's ID
+    i, j = KB_IDS['question'][sign['question']]
+    return f"{DISEASES[i]['key']}.{j}"
+
+@st.cache_resource
+def question_bundle(lang, stamps):
+    table = compile_catalog(lang, stamps)
+    return MappingProxyType({
+        'diseases': tuple(
+            (_translate(table, f"{d['key']}.name", d['name']), _translate(table, f"{d['key']}.summary", d['summary']))
+            for d in DISEASES),
+        'criteria': tuple(
+            tuple(_render_card(table, f"{d['key']}.{j}", c) for j, c in enumerate(d['criteria']))
+            for d in DISEASES),
+        'signs': tuple(_render_card(table, _sign_msg_id(sign), sign) for sign in get_scorer().columns),
+    })
+
+def bundle():
+    lang = st.session_state.get('lang', 'en')
+    return question_bundle(lang, catalog_stamps(lang))
 
 # --- Logging ---
+_last_fsync = 0.0
+_db_local = threading.local()
+
+CASE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cases (
+    id INTEGER PRIMARY KEY,
+    case_id TEXT,
+    ts REAL NOT NULL,
+    disease TEXT NOT NULL,
+    region TEXT,
+    lang TEXT,
+    kb_version TEXT,
+    responses TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cases_disease_ts ON cases (disease, ts);
+CREATE INDEX IF NOT EXISTS idx_cases_region_ts ON cases (region, ts);
+CREATE INDEX IF NOT EXISTS idx_cases_lang_ts ON cases (lang, ts);
+CREATE INDEX IF NOT EXISTS idx_cases_kb_ts ON cases (kb_version, ts);
+CREATE INDEX IF NOT EXISTS idx_cases_ts ON cases (ts);
+'''
+CASE_ID_INDEX = 'CREATE UNIQUE INDEX IF NOT EXISTS idx_cases_case_id ON cases (case_id)'
+
 def init_log():
-    if not os.path.exists(LOG_FILE):
+    if LOG_BACKEND == 'json' and not os.path.exists(LOG_FILE):
         with open(LOG_FILE, 'w') as f:
             json.dump([], f)
+    elif LOG_BACKEND == 'sqlite':
+        case_db()
+    save_kb_snapshot()
+
+def case_db():
+    # One connection per thread; WAL lets readers query while the writer thread commits
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(LOG_DB, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=' + ('FULL' if LOG_FSYNC == 'always' else 'NORMAL'))
+        conn.executescript(CASE_SCHEMA)
+        if 'case_id' not in [row[1] for row in conn.execute('PRAGMA table_info(cases)')]:
+            conn.execute('ALTER TABLE cases ADD COLUMN case_id TEXT')
+        conn.execute(CASE_ID_INDEX)
+        _db_local.conn = conn
+    return conn
+
+def _case_body(record):
+    if 'a' in record:
+        return {'d': record['d'], 'm': record['m'], 'a': record['a']}
+    return {'disease': record['disease'], 'responses': record['responses']}
+
+def insert_cases(records):
+    # disease stays a plain key column for indexing; the answers go in compact form
+    rows = [
+        (r.get('case'), r['ts'], case_disease_key(r), r.get('region'), r.get('lang'), r.get('kb'),
+         json.dumps(_case_body(r), ensure_ascii=False, separators=(',', ':')))
+        for r in records
+    ]
+    conn = case_db()
+    with conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO cases (case_id, ts, disease, region, lang, kb_version, responses) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+def _case_filter(disease, region, lang, kb_version, since, until):
+    clauses, params = [], []
+    for col, val in (('disease', disease), ('region', region), ('lang', lang), ('kb_version', kb_version)):
+        if val is not None:
+            clauses.append(f'{col} = ?')
+            params.append(val)
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(until)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+def query_cases(disease=None, region=None, lang=None, kb_version=None, since=None, until=None, limit=None):
+    # e.g. FMD cases in Kenya this week: query_cases('fmd', 'Kenya', since=time.time() - 7 * 86400)
+    where, params = _case_filter(disease, region, lang, kb_version, since, until)
+    sql = 'SELECT case_id, ts, disease, region, lang, kb_version, responses FROM cases' + where + ' ORDER BY ts'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    for case_id, ts, dis, reg, lng, kb, body in case_db().execute(sql, params):
+        body = json.loads(body)
+        record = {'case': case_id, 'ts': ts, 'region': reg, 'lang': lng, 'kb': kb}
+        record.update(body if isinstance(body, dict) else {'disease': dis, 'responses': body})
+        yield record
+
+def count_cases(disease=None, region=None, lang=None, kb_version=None, since=None, until=None):
+    where, params = _case_filter(disease, region, lang, kb_version, since, until)
+    return case_db().execute('SELECT COUNT(*) FROM cases' + where, params).fetchone()[0]
+
+def _fsync_due():
+    global _last_fsync
+    if LOG_FSYNC == 'always':
+        return True
+    if LOG_FSYNC == 'interval':
+        now = time.monotonic()
+        if now - _last_fsync >= LOG_FSYNC_INTERVAL:
+            _last_fsync = now
+            return True
+    return False
+
+@contextmanager
+def file_lock(path):
+    # Advisory lock on a sidecar file so several server processes can share one log
+    with open(path + '.lock', 'a') as lock:
+        if fcntl:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
 
-def log_symptoms(disease_key, responses):
+def segment_zdict():
+    # Preset dictionary of the text records repeat. zlib only keeps its last 32 KiB, so the verbose legacy
+    # tokens (question strings and options) go first and sample compact records, what log_symptoms writes,
+    # go last where truncation cannot drop them
+    parts = ['"disease":', '"responses":[']
+    parts += [f'"disease":"{d["key"]}"' for d in DISEASES]
+    for d in DISEASES:
+        for c in d['criteria']:
+            parts.append('{"question":' + json.dumps(c['question'], ensure_ascii=False) + ',"answer":')
+            parts += [json.dumps(o, ensure_ascii=False) + '}' for o in c['options']]
+    for i, d in enumerate(DISEASES):
+        for region in EMERGENCY_VET_CONTACT:
+            sample = {'case': '', 'ts': 0.0, 'region': region, 'lang': 'en', 'kb': KB_VERSION, 'd': i, 'm': 1,
+                      'a': [0] * len(d['criteria'])}
+            parts.append(json.dumps(sample, ensure_ascii=False, separators=(',', ':')) + '\n')
+    return ''.join(parts).encode('utf-8')[-32768:]
+
+def _zdict_path(zdict_id):
+    return f'{os.path.splitext(CASE_LOG_FILE)[0]}.{zdict_id}.zdict'
+
+def load_manifest():
+    if not os.path.exists(LOG_MANIFEST):
+        return {'segments': []}
+    with open(LOG_MANIFEST, encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_atomic(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _first_ts(path):
+    with open(path, encoding='utf-8') as f:
+        try:
+            return json.loads(f.readline()).get('ts')
+        except json.JSONDecodeError:
+            return None
+
+def _rotation_due():
     try:
-        with open(LOG_FILE, 'r+') as f:
+        size = os.path.getsize(CASE_LOG_FILE)
+    except FileNotFoundError:
+        return False
+    if size == 0:
+        return False
+    if size >= LOG_SEGMENT_MAX_BYTES:
+        return True
+    if LOG_ROTATE_DAILY:
+        start = _first_ts(CASE_LOG_FILE)
+        return start is not None and time.gmtime(start)[:3] != time.gmtime()[:3]
+    return False
+
+def rotate_segment():
+    # Caller holds file_lock(CASE_LOG_FILE)
+    zdict = segment_zdict()
+    zdict_id = hashlib.sha1(zdict).hexdigest()[:12]
+    if not os.path.exists(_zdict_path(zdict_id)):
+        _write_atomic(_zdict_path(zdict_id), zdict)
+    manifest = load_manifest()
+    comp = zlib.compressobj(9, zdict=zdict)
+    chunks, start, end, count = [], None, None, 0
+    with open(CASE_LOG_FILE, encoding='utf-8') as f:
+        for line in f:
             try:
-                data = json.load(f)
+                ts = json.loads(line).get('ts')
             except json.JSONDecodeError:
-                data = []
-            data.append({'disease': disease_key, 'responses': responses})
-            f.seek(0)
+                continue
+            if ts is not None:
+                start = ts if start is None else min(start, ts)
+                end = ts if end is None else max(end, ts)
+            count += 1
+            chunks.append(comp.compress(line.encode('utf-8')))
+    chunks.append(comp.flush())
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(start or time.time()))
+    name = f'{os.path.splitext(CASE_LOG_FILE)[0]}.{stamp}.{len(manifest["segments"])}.jsonl.z'
+    _write_atomic(name, b''.join(chunks))
+    manifest['segments'].append({'file': name, 'start': start, 'end': end, 'count': count, 'zdict': zdict_id})
+    _write_atomic(LOG_MANIFEST, json.dumps(manifest, indent=2).encode('utf-8'))
+    open(CASE_LOG_FILE, 'w').close()
+
+def append_cases(records):
+    # One JSON object per line; a case costs one append regardless of log size
+    data = ''.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')) + '\n' for r in records)
+    with file_lock(CASE_LOG_FILE):
+        if _rotation_due():
+            rotate_segment()
+        with open(CASE_LOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(data)
+            f.flush()
+            if _fsync_due():
+                os.fsync(f.fileno())
+
+def _parse_lines(lines, since, until):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # torn last line from a crash mid-write
+            continue
+        ts = record.get('ts')
+        if ts is not None and ((since is not None and ts < since) or (until is not None and ts >= until)):
+            continue
+        yield record
+
+def _segment_lines(segment):
+    with open(_zdict_path(segment['zdict']), 'rb') as f:
+        decomp = zlib.decompressobj(zdict=f.read())
+    tail = b''
+    with open(segment['file'], 'rb') as f:
+        while chunk := f.read(1 << 16):
+            lines = (tail + decomp.decompress(chunk)).split(b'\n')
+            tail = lines.pop()
+            for line in lines:
+                yield line.decode('utf-8')
+    tail += decomp.flush()
+    if tail:
+        yield tail.decode('utf-8')
+
+def read_cases(since=None, until=None):
+    # Streams records back in order without loading the log; segments outside [since, until) are skipped
+    for segment in load_manifest()['segments']:
+        if segment['start'] is not None:
+            if since is not None and segment['end'] < since:
+                continue
+            if until is not None and segment['start'] >= until:
+                continue
+        yield from _parse_lines(_segment_lines(segment), since, until)
+    if os.path.exists(CASE_LOG_FILE):
+        with open(CASE_LOG_FILE, encoding='utf-8') as f:
+            yield from _parse_lines(f, since, until)
+
+def write_cases(records):
+    if LOG_BACKEND == 'jsonl':
+        append_cases(records)
+        return
+    if LOG_BACKEND == 'sqlite':
+        insert_cases(records)
+        return
+    with file_lock(LOG_FILE):
+        with open(LOG_FILE) as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                # never start over with [] - that silently wipes the history
+                raise ValueError(f'{LOG_FILE} is not a valid JSON array, refusing to overwrite it: {e}')
+        data.extend(records)
+        tmp = f'{LOG_FILE}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
             json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, LOG_FILE)
+
+class LogWriter:
+    # Single background thread that drains queued records and commits them in batches
+    _STOP = object()
+
+    def __init__(self, write, batch_size, interval):
+        self._write = write
+        self._batch_size = batch_size
+        self._interval = interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'batches': 0, 'errors': 0, 'max_depth': 0, 'last_error': None}
+        # records from batches that failed every retry, written ahead of the next batch
+        self._held = []
+        self._thread = threading.Thread(target=self._run, name='diagarp-log-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        self._queue.put(record)
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+
+    def flush(self):
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._stats, queue_depth=self._queue.qsize(), held=len(self._held))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                # held records are retried on their own once the retry delay passes with nothing new queued
+                item = self._queue.get(timeout=LOG_RETRY_DELAY * 2 ** LOG_WRITE_RETRIES if self._held else None)
+            except queue.Empty:
+                self._commit([])
+                continue
+            if item is self._STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self._interval
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            for _ in batch:
+                self._queue.task_done()
+        if self._held:
+            logger.error('Case log writer stopped with %d unwritten records: %s', len(self._held),
+                         json.dumps(self._held, separators=(',', ':')))
+
+    def _commit(self, batch):
+        records = self._held + batch
+        delay = LOG_RETRY_DELAY
+        for attempt in range(LOG_WRITE_RETRIES + 1):
+            try:
+                self._write(records)
+            except Exception as e:
+                with self._lock:
+                    self._stats['errors'] += 1
+                    self._stats['last_error'] = repr(e)
+                logger.warning('Writing %d case records failed (attempt %d): %r', len(records), attempt + 1, e)
+                if attempt < LOG_WRITE_RETRIES:
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            with self._lock:
+                self._stats['written'] += len(records)
+                self._stats['batches'] += 1
+            self._held = []
+            return
+        logger.error('Holding %d case records after %d failed writes', len(records), LOG_WRITE_RETRIES + 1)
+        self._held = records
+
+class SeenCases:
+    # Bounded, thread-safe memory of case IDs already logged by this process
+    def __init__(self, size):
+        self._size = size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, case_id):
+        with self._lock:
+            if case_id in self._ids:
+                return False
+            self._ids[case_id] = None
+            if len(self._ids) > self._size:
+                self._ids.popitem(last=False)
+            return True
+
+@st.cache_resource
+def get_seen_cases():
+    return SeenCases(LOG_DEDUP_WINDOW)
+
+@st.cache_resource
+def get_log_writer():
+    # One writer per process, shared by every session thread; drained on shutdown
+    writer = LogWriter(write_cases, LOG_BATCH_SIZE, LOG_BATCH_INTERVAL)
+    atexit.register(writer.close)
+    return writer
+
+def log_symptoms(disease_id, codes, case_id=None, matched=True):
+    # Result-page reruns call this again for the same case; only the first call is written
+    if case_id is not None and not get_seen_cases().add(case_id):
+        return
+    codes = list(codes)
+    while codes and codes[-1] == -1:
+        codes.pop()
+    record = {
+        'case': case_id,
+        'ts': time.time(),
+        'region': st.session_state.get('region'),
+        'lang': st.session_state.get('lang'),
+        'kb': KB_VERSION,
+        'd': disease_id,
+        'm': int(matched),
+        'a': codes,
+    }
+    if LOG_ASYNC:
+        get_log_writer().submit(record)
+        return
+    try:
+        write_cases([record])
     except Exception as e:
         st.error(f"Logging error: {e}")
 
+# --- Legacy Log Migration ---
+def _needs_more(buf, err):
+    # A decode error the next chunk could fix: the failing token runs to the end of the buffer. The strict
+    # decoder rejects raw newlines in strings, so an unterminated string always does
+    return err.msg.startswith('Unterminated string') or re.fullmatch(r'[\w.+\-\\]*', buf[err.pos:]) is not None
+
+def iter_legacy_array(path, chunk_size=1 << 20):
+    # Decodes the top-level array of a legacy LOG_FILE one element at a time, holding at most one
+    # record plus one chunk in memory; elements must be separated by single commas and the array closed
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buf, pos, offset, eof, more = '', 0, 0, False, True
+        expect = '['  # '[', 'first' (an element or ']'), 'item' (an element) or ',' (',' or ']')
+        while True:
+            if more:
+                chunk = f.read(chunk_size)
+                eof, more = not chunk, False
+                offset += pos
+                buf, pos = buf[pos:] + chunk, 0
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos == len(buf):
+                if not eof:
+                    more = True
+                    continue
+                if expect == '[':
+                    return
+                raise ValueError(f'{path}: JSON array not closed at offset {offset + pos}')
+            ch = buf[pos]
+            if expect == '[' or (expect == ',' and ch == ','):
+                if ch != expect:
+                    raise ValueError(f'{path}: expected {expect!r} at offset {offset + pos}')
+                expect = 'first' if ch == '[' else 'item'
+                pos += 1
+            elif ch == ']' and expect in (',', 'first'):
+                return
+            elif expect == ',':
+                raise ValueError(f"{path}: expected ',' or ']' at offset {offset + pos}")
+            else:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                    # a value ending exactly at the buffer end may continue in the next chunk
+                    more = not eof and end == len(buf)
+                except json.JSONDecodeError as e:
+                    if eof or not _needs_more(buf, e):
+                        raise ValueError(f'{path}: invalid JSON at offset {offset + e.pos}: {e.msg}') from None
+                    more = True
+                if not more:
+                    yield item
+                    expect, pos = ',', end
+
+def legacy_match(disease, pairs):
+    if disease not in KB_IDS['disease']:
+        return False
+    answers = dict(pairs)
+    return all(answers.get(c['question']) in c['positive'] for c in DISEASES[KB_IDS['disease'][disease]]['criteria'])
+
+def normalize_legacy_record(record, ts):
+    # Legacy shapes: list of {'question', 'answer'} (v08.6+), list of (criterion, answer) pairs where the
+    # criterion is a dict or a question string (v06.8-v08.5), or a {question: answer} dict (v06-v06.7)
+    responses = record.get('responses') or []
+    if isinstance(responses, dict):
+        pairs = list(responses.items())
+    else:
+        pairs = []
+        for r in responses:
+            if isinstance(r, dict):
+                pairs.append((r['question'], r['answer']))
+            else:
+                crit, ans = r
+                pairs.append((crit['question'] if isinstance(crit, dict) else crit, ans))
+    disease = record.get('disease', 'none')
+    if isinstance(responses, dict) or not all(isinstance(r, dict) for r in responses):
+        # these versions logged the disease checked, matched or not; it matched if every criterion was
+        # answered with a positive option
+        disease = disease if legacy_match(disease, pairs) else 'none'
+    return {
+        'case': record.get('case'),
+        'ts': record.get('ts', ts),
+        'disease': disease,
+        'region': record.get('region'),
+        'lang': record.get('lang'),
+        'kb': record.get('kb'),
+        'responses': [{'question': q, 'answer': a} for q, a in pairs],
+    }
+
+def _normalize_chunk(args):
+    records, ts, case_prefix, first = args
+    out = []
+    for i, record in enumerate(records, first):
+        rec = compact_record(normalize_legacy_record(record, ts), record.get('disease'))
+        # deterministic IDs make re-running a migration into sqlite a no-op
+        rec['case'] = rec['case'] or f'{case_prefix}-{i}'
+        out.append(rec)
+    return out
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def migrate_legacy_log(path, workers=None, chunk_size=5000):
+    global LOG_ROTATE_DAILY
+    # Legacy records carry no timestamp; the legacy file's mtime stands in as an upper bound
+    ts = os.path.getmtime(path)
+    case_prefix = 'legacy-' + hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    workers = workers or os.cpu_count() or 1
+    # compacted records name the current KB version, so its snapshot must exist to decode them later
+    save_kb_snapshot()
+    # every migrated record is stamped with a past day; rotating on that would close a segment per chunk,
+    # so only the size limit applies until the migration is done
+    rotate_daily, LOG_ROTATE_DAILY = LOG_ROTATE_DAILY, False
+    migrated, pending, first = 0, [], 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk in _chunks(iter_legacy_array(path), chunk_size):
+                pending.append(pool.submit(_normalize_chunk, (chunk, ts, case_prefix, first)))
+                first += len(chunk)
+                # bounded window keeps memory flat; chunks are written in their original order
+                if len(pending) >= workers * 2:
+                    batch = pending.pop(0).result()
+                    write_cases(batch)
+                    migrated += len(batch)
+            for future in pending:
+                batch = future.result()
+                write_cases(batch)
+                migrated += len(batch)
+    finally:
+        LOG_ROTATE_DAILY = rotate_daily
+    return migrated
+
+def migrate_cli(argv):
+    global LOG_BACKEND
+    parser = argparse.ArgumentParser(prog='migrate', description='Stream a legacy symptom_logs.json array into the case store')
+    parser.add_argument('source', nargs='?', default=LOG_FILE)
+    parser.add_argument('--backend', choices=['jsonl', 'sqlite'], default='jsonl' if LOG_BACKEND == 'json' else LOG_BACKEND)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+    LOG_BACKEND = args.backend
+    count = migrate_legacy_log(args.source, args.workers, args.chunk_size)
+    print(f'Migrated {count} records from {args.source} into the {LOG_BACKEND} store')
+
+# --- Session Store ---
+# Checkpoints hold the same compact snapshot as the URL state, keyed by case ID
+class MemorySessionStore:
+    def __init__(self, size, ttl):
+        self._size, self._ttl = size, ttl
+        self._cases = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'checkpoints': 0, 'resumes': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def _expire(self, now):
+        # least recently touched first, so expired cases are always at the front
+        while self._cases and next(iter(self._cases.values()))[0] <= now:
+            self._cases.popitem(last=False)
+            self._stats['expired'] += 1
+
+    def put(self, case_id, snapshot):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            self._cases[case_id] = (now + self._ttl, snapshot)
+            self._cases.move_to_end(case_id)
+            self._stats['checkpoints'] += 1
+            while len(self._cases) > self._size:
+                self._cases.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def get(self, case_id):
+        with self._lock:
+            self._expire(time.time())
+            entry = self._cases.get(case_id)
+            self._stats['resumes' if entry else 'misses'] += 1
+            return entry[1] if entry else None
+
+    def metrics(self):
+        with self._lock:
+            self._expire(time.time())
+            return dict(self._stats, live=len(self._cases))
+
+SESSION_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    case_id TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires);
+'''
+
+class SqliteSessionStore:
+    def __init__(self, path, ttl):
+        self._path, self._ttl = path, ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'checkpoints': 0, 'resumes': 0, 'misses': 0, 'expired': 0}
+        self._next_purge = 0.0
+
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SESSION_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def put(self, case_id, snapshot):
+        now = time.time()
+        conn = self._db()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO sessions (case_id, expires, state) VALUES (?, ?, ?)',
+                         (case_id, now + self._ttl, json.dumps(snapshot, separators=(',', ':'))))
+            # expired rows are swept at most once a minute per process
+            if now >= self._next_purge:
+                self._next_purge = now + 60
+                self._count('expired', conn.execute('DELETE FROM sessions WHERE expires <= ?', (now,)).rowcount)
+        self._count('checkpoints')
+
+    def get(self, case_id):
+        row = self._db().execute('SELECT state FROM sessions WHERE case_id = ? AND expires > ?',
+                                 (case_id, time.time())).fetchone()
+        self._count('resumes' if row else 'misses')
+        return json.loads(row[0]) if row else None
+
+    def metrics(self):
+        live = self._db().execute('SELECT COUNT(*) FROM sessions WHERE expires > ?', (time.time(),)).fetchone()[0]
+        with self._lock:
+            return dict(self._stats, live=live)
+
+class RedisSessionStore:
+    # Expiry is left to the server (SETEX), so it is not counted here
+    PREFIX = 'diagarp:case:'
+
+    def __init__(self, url, ttl):
+        if redis is None:
+            raise RuntimeError("SESSION_STORE = 'redis' needs the redis package")
+        self._client, self._ttl = redis.Redis.from_url(url), ttl
+        self._lock = threading.Lock()
+        self._stats = {'checkpoints': 0, 'resumes': 0, 'misses': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def put(self, case_id, snapshot):
+        self._client.setex(self.PREFIX + case_id, self._ttl, json.dumps(snapshot, separators=(',', ':')))
+        self._count('checkpoints')
+
+    def get(self, case_id):
+        raw = self._client.get(self.PREFIX + case_id)
+        self._count('resumes' if raw else 'misses')
+        return json.loads(raw) if raw else None
+
+    def metrics(self):
+        live = sum(1 for _ in self._client.scan_iter(match=self.PREFIX + '*', count=1000))
+        with self._lock:
+            return dict(self._stats, live=live)
+
+@st.cache_resource
+def get_session_store():
+    if SESSION_STORE == 'memory':
+        return MemorySessionStore(SESSION_STORE_SIZE, SESSION_TTL)
+    if SESSION_STORE == 'sqlite':
+        return SqliteSessionStore(SESSION_DB, SESSION_TTL)
+    if SESSION_STORE == 'redis':
+        return RedisSessionStore(SESSION_REDIS_URL, SESSION_TTL)
+    raise ValueError(f'Unknown SESSION_STORE {SESSION_STORE!r}')
+
 # --- State Management ---
 def init_state():
     if 'stage' not in st.session_state:
         st.session_state.stage = 'symptom'
-        st.session_state.selected = None
-        st.session_state.responses = []
+        st.session_state.disease_id = None
+        st.session_state.case_id = None
         st.session_state.index = 0
-        # default language and region
+        st.session_state.asked = 0
+        st.session_state.bits = 0
+        st.session_state.screen_answers = None
+        st.session_state.screen_path = []
+        st.session_state.evidence = None
+    # default language and region; kept across restarts, and region is owned by its widget after the first run
+    if 'lang' not in st.session_state:
         st.session_state.lang = 'en'
+    if 'region' not in st.session_state:
         st.session_state.region = 'Nigeria'
 
+def answer_question(state, disease_id, code):
+    # Applies the answer to the current question of a single-disease case; state is the session state or,
+    # when replaying a snapshot, a plain dict with the same keys
+    kb, scorer = get_kb(), get_scorer()
+    idx = state['index']
+    crit = kb.criterion(disease_id, idx)
+    n = len(kb.diseases[disease_id]['criteria'])
+    state['asked'], state['bits'] = kb.layouts[disease_id].set(state['asked'], state['bits'], idx, code)
+    state['evidence'] = scorer.update(state['evidence'], scorer.crit_col[disease_id][idx], code)
+    if SCORING == 'weighted':
+        # keep going through uncertain or negative answers while a match is still reachable
+        state['index'] += 1
+        if state['index'] >= n or not scorer.can_match(state['evidence'])[disease_id]:
+            state['stage'] = 'result'
+    elif crit['options'][code] not in crit['positive']:
+        state['stage'] = 'result'
+    else:
+        state['index'] += 1
+        if state['index'] >= n:
+            state['stage'] = 'result'
+
+def reset_case():
+    for k in list(st.session_state.keys()):
+        if k not in ['lang', 'region']:
+            del st.session_state[k]
+    st.query_params.clear()
+    init_state()
+
+def case_snapshot():
+    # The case as a flat dict of strings: KB hash, stage, language, case ID and the answers so far
+    state = st.session_state
+    params = {'kb': KB_VERSION, 's': state.stage, 'l': state.lang}
+    if state.case_id:
+        params['c'] = state.case_id
+    if state.stage in ('question', 'result'):
+        params.update(d=str(state.disease_id), i=str(state.index), a=AnswerBits.pack(state.asked, state.bits))
+    elif state.stage in ('screen', 'differential'):
+        params['p'] = ','.join(f'{c}:{k}' for c, k in state.screen_path)
+    return params
+
+def save_url_state():
+    params = case_snapshot()
+    if dict(st.query_params) != params:
+        st.query_params.from_dict(params)
+
+def checkpoint_case():
+    snapshot = case_snapshot()
+    if snapshot.get('c') and snapshot != st.session_state.get('checkpoint'):
+        get_session_store().put(snapshot['c'], snapshot)
+        st.session_state.checkpoint = snapshot
+
+def resume_case(case_id):
+    snapshot = get_session_store().get(case_id.strip())
+    return snapshot is not None and restore_case(snapshot)
+
+def restore_url_state():
+    return restore_case(st.query_params)
+
+def restore_case(params):
+    # Rebuilds the session's case from a snapshot; ones from another KB version, or malformed, are ignored
+    if params.get('kb') != KB_VERSION or params.get('s') not in ('question', 'result', 'screen', 'differential'):
+        return False
+    # Only states the pages themselves can reach are accepted: the answers are replayed through the same
+    # transitions and must end at exactly the snapshot's stage, question index and answer bits
+    kb, scorer = get_kb(), get_scorer()
+    try:
+        if params['s'] in ('question', 'result'):
+            disease_id = int(params['d'])
+            if not 0 <= disease_id < len(kb.diseases):
+                return False
+            asked, bits = AnswerBits.unpack(params['a'])
+            codes = kb.codes(disease_id, asked, bits)
+            answered = [k for k in codes if k >= 0]
+            if codes[:len(answered)] != answered:  # answers must be a prefix of the criteria
+                return False
+            state = {'stage': 'question', 'index': 0, 'asked': 0, 'bits': 0, 'evidence': scorer.start()}
+            for k in answered:
+                if state['stage'] != 'question':
+                    return False
+                answer_question(state, disease_id, k)
+            if (state['stage'], state['index'], state['asked'], state['bits']) != (params['s'], int(params['i']), asked, bits):
+                return False
+            update = dict(state, disease_id=disease_id)
+        else:
+            path = [tuple(map(int, step.split(':'))) for step in params.get('p', '').split(',') if step]
+            answers, evidence = scorer.empty(), scorer.start()
+            for c, k in path:
+                # each sign once, and only while it is still worth asking
+                if not (0 <= c < len(answers) and c in scorer.remaining(answers, evidence)
+                        and 0 <= k < len(scorer.columns[c]['options'])):
+                    return False
+                answers[c] = k
+                evidence = scorer.update(evidence, c, k)
+            if (params['s'] == 'differential') != (not scorer.remaining(answers, evidence).size):
+                return False
+            update = {'screen_answers': answers, 'screen_path': path, 'evidence': evidence, 'stage': params['s']}
+    except (KeyError, ValueError, IndexError):
+        return False
+    if update['stage'] in ('result', 'differential') and params.get('c'):
+        # the worker that first rendered this result already logged it; only SQLite enforces unique case IDs
+        get_seen_cases().add(params['c'])
+    st.session_state.update(update, case_id=params.get('c'))
+    if params.get('l') in load_translations():
+        st.session_state.lang = params['l']
+    return True
+
 # --- UI Components ---
 def sidebar_setup():
     logo = 'images/logo.png'
@@ -99,29 +1622,80 @@ def sidebar_setup():
     if st.session_state.stage == 'symptom':
         p = 0
     elif st.session_state.stage == 'question':
-        total = len(st.session_state.selected['criteria'])
+        total = len(get_kb().diseases[st.session_state.disease_id]['criteria'])
         p = int(((st.session_state.index + 1)/total)*100)
+    elif st.session_state.stage == 'screen':
+        p = screen_step()['progress']
     else:
         p = 100
     st.sidebar.progress(p)
+    if SESSION_STORE and st.session_state.case_id:
+        st.sidebar.caption(f"{t('Case ID')}: {st.session_state.case_id}")
+
+def screen_step():
+    # Next sign and progress for the current screen prefix, shared across sessions on the same path
+    scorer = get_scorer()
+    answers, evidence = st.session_state.screen_answers, st.session_state.evidence
+
+    def compute():
+        done = sum(a >= 0 for a in answers)
+        remaining = len(scorer.remaining(answers, evidence))
+        return {'next': scorer.next_column(answers, evidence, SCREEN_ORDER),
+                'progress': int(done / (done + remaining) * 100) if done + remaining else 100}
+    path = (KB_VERSION, 'screen', SCREEN_ORDER, SCORING) + tuple(st.session_state.screen_path)
+    return get_prefix_cache().lookup(path, compute)
+
+def disease_verdict(disease_id):
+    layout = get_kb().layouts[disease_id]
+    asked, bits, evidence = st.session_state.asked, st.session_state.bits, st.session_state.evidence
+
+    def compute():
+        if SCORING == 'weighted':
+            confidence = get_scorer().confidence(evidence, disease_id)
+            match = confidence >= WEIGHTED_MATCH_CONFIDENCE
+        else:
+            confidence, match = None, layout.match(asked, bits)
+        matched, _, answered = layout.counts(asked, bits)
+        return {'match': bool(match), 'confidence': confidence, 'matched': matched, 'answered': answered,
+                'failed': () if match else tuple(layout.failed_criteria(asked, bits))}
+    # keyed on every criterion's code (-1 if unasked), so which criterion each answer belongs to is in the key
+    path = (KB_VERSION, 'result', SCORING, disease_id) + tuple(layout.decode(asked, bits))
+    return get_prefix_cache().lookup(path, compute)
 
 # --- Pages ---
 def page_symptom():
     st.header(t('What is the primary symptom observed?'))
     form = st.form(key='symptom_form')
-    choice = form.radio('', list(SYMPTOM_MAP.keys()), horizontal=True)
+    choice = form.radio('', list(SYMPTOM_MAP.keys()) + [SCREEN_CHOICE], horizontal=True, format_func=t)
     if form.form_submit_button(t('Next')):
-        key = SYMPTOM_MAP[choice]
-        st.session_state.selected = next(d for d in DISEASES if d['key']==key)
+        if choice == SCREEN_CHOICE:
+            st.session_state.case_id = uuid.uuid4().hex
+            st.session_state.screen_answers = get_scorer().empty()
+            st.session_state.screen_path = []
+            st.session_state.evidence = get_scorer().start()
+            st.session_state.stage = 'screen'
+            st.rerun()
+        st.session_state.disease_id = get_kb().primary[choice]
+        st.session_state.case_id = uuid.uuid4().hex
         st.session_state.stage = 'question'
-        st.session_state.responses = []
         st.session_state.index = 0
+        st.session_state.asked = 0
+        st.session_state.bits = 0
+        st.session_state.evidence = get_scorer().start()
+    if SESSION_STORE:
+        resume = st.form(key='resume_form')
+        case_id = resume.text_input(t('Case ID'))
+        if resume.form_submit_button(t('Resume')) and case_id:
+            if resume_case(case_id):
+                st.rerun()
+            st.warning(t('No saved case with that ID.'))
 
 
 def page_question():
-    disease = st.session_state.selected
+    kb = get_kb()
+    disease_id = st.session_state.disease_id
+    disease = kb.diseases[disease_id]
     idx = st.session_state.index
-    crit = disease['criteria'][idx]
     st.subheader(f"{t('Question')} {idx+1} {t('of')} {len(disease['criteria'])}")
     img_path = disease['images'][idx % len(disease['images'])]
     if os.path.exists(img_path):
@@ -129,48 +1703,113 @@ def page_question():
             st.image(img_path, use_container_width=True)
         except:
             pass
+    card = bundle()['criteria'][disease_id][idx]
     form = st.form(key=f'question_form_{idx}')
-    ans = form.radio(t(crit['question']), crit['options'])
+    code = form.radio(card.question, range(len(card.options)), format_func=card.options.__getitem__)
     if form.form_submit_button(t('Next')):
-        st.session_state.responses.append({'question': crit['question'], 'answer': ans})
-        if ans not in crit['positive']:
-            st.session_state.stage = 'result'
-        else:
-            st.session_state.index += 1
-            if st.session_state.index >= len(disease['criteria']):
-                st.session_state.stage = 'result'
+        answer_question(st.session_state, disease_id, code)
 
 
 def page_result():
-    disease = st.session_state.selected
-    match = (st.session_state.stage == 'result') and all(
-        r['answer'] in next(c for c in disease['criteria'] if c['question']==r['question'])['positive']
-        for r in st.session_state.responses
-    )
-    log_symptoms(disease['key'] if match else 'none', st.session_state.responses)
+    kb = get_kb()
+    disease_id = st.session_state.disease_id
+    verdict = disease_verdict(disease_id)
+    match = verdict['match']
+    codes = kb.codes(disease_id, st.session_state.asked, st.session_state.bits)
+    log_symptoms(disease_id, codes, st.session_state.case_id, matched=match)
+    cards = bundle()
+    if match:
+        name, summary = cards['diseases'][disease_id]
+        st.success(f"✅ {t('Likely diagnosis:')} {name}")
+        st.write(summary)
+    else:
+        st.error(t('Symptoms do not fully match. Please consult a veterinarian.'))
+    st.markdown(f"{verdict['matched']}/{verdict['answered']} {t('criteria matched')}")
+    if verdict['confidence'] is not None:
+        st.markdown(f"{t('Confidence')}: {verdict['confidence']:.0%}")
+    for j in verdict['failed']:
+        st.markdown(f"- {cards['criteria'][disease_id][j].question}")
+    st.markdown(f"**Emergency vet:** {EMERGENCY_VET_CONTACT[st.session_state.region]}")
+    if st.button(t('Restart')):
+        reset_case()
+
+def page_screen():
+    scorer = get_scorer()
+    answers = st.session_state.screen_answers
+    col = screen_step()['next']
+    if col is None:
+        st.session_state.stage = 'differential'
+        st.rerun()
+    card = bundle()['signs'][col]
+    st.subheader(f"{t('Question')} {sum(a >= 0 for a in answers) + 1}")
+    form = st.form(key=f'screen_form_{col}')
+    code = form.radio(card.question, range(len(card.options)), format_func=card.options.__getitem__)
+    if form.form_submit_button(t('Next')):
+        answers[col] = code
+        st.session_state.screen_path.append((col, answers[col]))
+        st.session_state.evidence = scorer.update(st.session_state.evidence, col, answers[col])
+        st.rerun()
+
+
+def page_differential():
+    scorer = get_scorer()
+    answers = st.session_state.screen_answers
+    path = (KB_VERSION, 'differential', SCORING) + tuple(st.session_state.screen_path)
+    ranked = get_prefix_cache().lookup(path, lambda: scorer.differential(answers, st.session_state.evidence)[:3])
+    best = ranked[0]
+    match = best['match']
+    codes = scorer.disease_answers(best['disease'], answers)
+    log_symptoms(best['disease'], codes, st.session_state.case_id, matched=match)
+    names = bundle()['diseases']
     if match:
-        st.success(f"✅ {t('Likely diagnosis:')} {disease['name']}")
-        st.write(disease['summary'])
+        name, summary = names[best['disease']]
+        st.success(f"✅ {t('Likely diagnosis:')} {name}")
+        st.write(summary)
     else:
         st.error(t('Symptoms do not fully match. Please consult a veterinarian.'))
+    st.subheader(t('Differential'))
+    for r in ranked[:3]:
+        if r['hits'] == 0:
+            break
+        st.markdown(f"**{names[r['disease']][0]}** - {r['hits']:g}/{r['total']:g} {t('criteria matched')}")
+        st.progress(r['confidence'] if SCORING == 'weighted' else r['fraction'])
     st.markdown(f"**Emergency vet:** {EMERGENCY_VET_CONTACT[st.session_state.region]}")
     if st.button(t('Restart')):
-        for k in list(st.session_state.keys()):
-            if k not in ['lang', 'region']:
-                del st.session_state[k]
-        init_state()
+        reset_case()
+        st.rerun()
 
 # --- Main ---
 def main():
     init_log()
+    fresh = 'stage' not in st.session_state
     init_state()
+    if URL_STATE and fresh:
+        restore_url_state()
     sidebar_setup()
-    if st.session_state.stage == 'symptom':
-        page_symptom()
-    elif st.session_state.stage == 'question':
-        page_question()
-    else:
-        page_result()
+    try:
+        if st.session_state.stage == 'symptom':
+            page_symptom()
+        elif st.session_state.stage == 'question':
+            page_question()
+        elif st.session_state.stage == 'screen':
+            page_screen()
+        elif st.session_state.stage == 'differential':
+            page_differential()
+        else:
+            page_result()
+    finally:
+        # also runs when a page calls st.rerun(), so the URL and checkpoint always hold the latest step
+        if URL_STATE:
+            save_url_state()
+        if SESSION_STORE:
+            checkpoint_case()
 
 if __name__ == '__main__':
-    main()
+    # `python "Diagarp v08.7.py" migrate [symptom_logs.json]` converts a legacy log, `... compile-policy`
+    # precomputes the screening policy; `streamlit run` serves the app
+    if len(sys.argv) > 1 and sys.argv[1] == 'migrate':
+        migrate_cli(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == 'compile-policy':
+        compile_policy_cli(sys.argv[2:])
+    else:
+        main()
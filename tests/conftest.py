@@ -0,0 +1,17 @@
+import importlib.util
+import logging
+import os
+
+import pytest
+
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+APP = os.path.join(os.path.dirname(__file__), '..', 'Diagarp v08.7.py')
+
+
+@pytest.fixture(scope='session')
+def app():
+    spec = importlib.util.spec_from_file_location('diagarp_app', APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
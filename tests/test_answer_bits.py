@@ -0,0 +1,44 @@
+import random
+
+# Every field shape: yes/no either way round, both or neither option positive, one-hot with several positives
+CRITERIA = [
+    {'question': 'A?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+    {'question': 'B?', 'options': ['Yes', 'No'], 'positive': ['No']},
+    {'question': 'C?', 'options': ['Yes', 'No', 'Not sure'], 'positive': ['Yes']},
+    {'question': 'D?', 'options': ['Red', 'Dark', 'Normal'], 'positive': ['Red', 'Dark']},
+    {'question': 'E?', 'options': ['Yes', 'No'], 'positive': ['Yes', 'No']},
+    {'question': 'F?', 'options': ['Yes', 'No'], 'positive': []},
+]
+
+
+def kbs(app):
+    return [CRITERIA] + [d['criteria'] for d in app.DISEASES]
+
+
+def test_layout_agrees_with_answer_lists(app):
+    rnd = random.Random(0)
+    for criteria in kbs(app):
+        layout = app.AnswerBits(criteria)
+        for _ in range(2000):
+            codes = [rnd.randrange(-1, len(c['options'])) for c in criteria]
+            asked = bits = 0
+            for j in rnd.sample(range(len(codes)), len(codes)):
+                if codes[j] >= 0:
+                    asked, bits = layout.set(asked, bits, j, codes[j])
+            answered = [j for j, code in enumerate(codes) if code >= 0]
+            failed = [j for j in answered if criteria[j]['options'][codes[j]] not in criteria[j]['positive']]
+            assert layout.decode(asked, bits) == codes
+            assert layout.match(asked, bits) == (
+                len(answered) == len(criteria)
+                and all(criteria[j]['options'][codes[j]] in criteria[j]['positive'] for j in answered))
+            assert sorted(layout.failed_criteria(asked, bits)) == failed
+            assert layout.counts(asked, bits) == (len(answered) - len(failed), len(failed), len(answered))
+            assert app.AnswerBits.unpack(app.AnswerBits.pack(asked, bits)) == (asked, bits)
+
+
+def test_layout_set_overwrites(app):
+    layout = app.AnswerBits(CRITERIA)
+    asked, bits = layout.set(0, 0, 3, 0)
+    asked, bits = layout.set(asked, bits, 3, 2)
+    assert layout.decode(asked, bits)[3] == 2
+    assert layout.failed_criteria(asked, bits) == [3]
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+RECORDS = [
+    {'disease': 'fmd', 'responses': {'Is the cow drooling or foaming at the mouth?': 'Yes'}},
+    {'disease': 'none', 'responses': [{'question': 'Q é "quoted"', 'answer': 'No'}], 'ts': 1712345678.25},
+    {'responses': [[{'question': 'Q'}, 'Yes']], 'n': None, 'ok': True, 'x': -12.5e3},
+]
+FMD = [
+    'Is the cow drooling or foaming at the mouth?',
+    'Do you see blisters or raw ulcers in the cow’s mouth?',
+    'Is the cow lame or reluctant to move due to hoof lesions?',
+    'Have multiple animals shown these signs at the same time?',
+    'Was there recent movement of animals into the herd?',
+]
+
+
+def write(tmp_path, text):
+    path = tmp_path / 'legacy.json'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 20])
+def test_legacy_array_any_chunking(app, tmp_path, chunk_size):
+    for text in (json.dumps(RECORDS), json.dumps(RECORDS, indent=2, ensure_ascii=False)):
+        assert list(app.iter_legacy_array(write(tmp_path, text), chunk_size)) == RECORDS
+
+
+@pytest.mark.parametrize('text', ['', '[]', ' [ ]\n'])
+def test_legacy_array_empty(app, tmp_path, text):
+    assert list(app.iter_legacy_array(write(tmp_path, text), 2)) == []
+
+
+@pytest.mark.parametrize('text', [
+    '[{"a":1},',
+    '[{"a":1}',
+    '[{"a":1} {"b":2}]',
+    '[{"a":1},,{"b":2}]',
+    '[{"a":1},]',
+    '[,{"a":1}]',
+    '{"a":1}',
+    '[{"a":tru}]',
+])
+def test_legacy_array_malformed(app, tmp_path, text):
+    with pytest.raises(ValueError):
+        list(app.iter_legacy_array(write(tmp_path, text), 3))
+
+
+def test_legacy_array_stops_at_corruption(app, tmp_path, monkeypatch):
+    # A bad element early in a large file is reported without reading the rest of it
+    path = write(tmp_path, '[{"a":1},{"a":oops},' + ','.join(['{"a":1}'] * 100_000) + ']')
+    reads = []
+    real_open = open
+
+    def counting_open(*args, **kwargs):
+        f = real_open(*args, **kwargs)
+        read = f.read
+        f.read = lambda n=-1: reads.append(n) or read(n)
+        return f
+
+    monkeypatch.setattr(app, 'open', counting_open, raising=False)
+    with pytest.raises(ValueError, match='offset 14'):
+        list(app.iter_legacy_array(path, 64))
+    assert len(reads) <= 2
+
+
+@pytest.mark.parametrize('responses, disease', [
+    ({q: 'Yes' for q in FMD[:2]}, 'none'),
+    ({q: 'Yes' for q in FMD}, 'fmd'),
+    ([[{'question': q}, 'Yes'] for q in FMD], 'fmd'),
+    ([[q, 'Yes' if j else 'No'] for j, q in enumerate(FMD)], 'none'),
+    ([{'question': FMD[0], 'answer': 'No'}], 'fmd'),
+])
+def test_legacy_verdict(app, responses, disease):
+    # Dict- and pair-shaped records name the disease checked, so the verdict comes from the answers;
+    # {'question', 'answer'} records already carry it
+    rec, = app._normalize_chunk(([{'disease': 'fmd', 'responses': responses}], 0.0, 'legacy', 0))
+    assert app.case_disease_key(rec) == disease
+    assert rec['d'] == app.KB_IDS['disease']['fmd']
@@ -0,0 +1,88 @@
+import random
+
+import numpy as np
+import pytest
+
+# Shared signs, a three-way option and uncertain answers, so every part of the running state is exercised
+SYMPTOMS = [
+    {'key': 'fever', 'question': 'Fever?', 'options': ['Yes', 'No']},
+    {'key': 'weakness', 'question': 'Weak?', 'options': ['Yes', 'No', 'Not sure']},
+]
+DISEASES = [
+    {'key': 'a', 'criteria': [
+        {'question': 'Fever?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'fever'},
+        {'question': 'Weak?', 'options': ['Yes', 'No', 'Not sure'], 'positive': ['Yes'], 'symptom': 'weakness'},
+        {'question': 'Urine?', 'options': ['Red', 'Dark', 'Normal'], 'positive': ['Red', 'Dark']},
+    ]},
+    {'key': 'b', 'criteria': [
+        {'question': 'Fever?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'symptom': 'fever'},
+        {'question': 'Cough?', 'options': ['Yes', 'No', 'Unknown'], 'positive': ['Yes'], 'weight': 2.0},
+        {'question': 'Ticks?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+    ]},
+    {'key': 'c', 'criteria': [
+        {'question': 'Weak?', 'options': ['Yes', 'No', 'Not sure'], 'positive': ['Yes'], 'symptom': 'weakness'},
+        {'question': 'Nodules?', 'options': ['Yes', 'No'], 'positive': ['Yes'], 'lr': {'Yes': 9.0, 'No': 0.2}},
+    ]},
+]
+FIELDS = ('hits', 'misses', 'log_odds', 'headroom', 'log_lik')
+
+
+@pytest.mark.parametrize('mode', ['strict', 'weighted'])
+def test_update_matches_rescan(app, mode):
+    scorer = app.Scorer(DISEASES, SYMPTOMS, mode)
+    for seed in range(200):
+        rnd = random.Random(seed)
+        answers, evidence = scorer.empty(), scorer.start()
+        for col in rnd.sample(range(len(answers)), rnd.randrange(len(answers) + 1)):
+            answers[col] = rnd.randrange(len(scorer.columns[col]['options']))
+            evidence = scorer.update(evidence, col, answers[col])
+            full = scorer.rescan(answers)
+            for field in FIELDS:
+                np.testing.assert_allclose(getattr(evidence, field), getattr(full, field), atol=1e-9, err_msg=field)
+            assert list(scorer.remaining(answers, evidence)) == list(scorer.remaining(answers, full))
+            ranked = [(r['disease'], r['match']) for r in scorer.differential(answers, evidence)]
+            assert ranked == [(r['disease'], r['match']) for r in scorer.differential(answers, full)]
+
+
+# Two diseases reading one sign in opposite ways
+OPPOSED = [
+    {'key': 'x', 'criteria': [
+        {'question': 'Grazing?', 'options': ['Yes', 'No', 'Not sure'], 'positive': ['Yes'], 'symptom': 'grazing'},
+        {'question': 'Bloat?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+    ]},
+    {'key': 'y', 'criteria': [
+        {'question': 'Grazing?', 'options': ['Yes', 'No', 'Not sure'], 'positive': ['No'], 'symptom': 'grazing'},
+        {'question': 'Cough?', 'options': ['Yes', 'No'], 'positive': ['Yes']},
+    ]},
+]
+GRAZING = [{'key': 'grazing', 'question': 'Grazing?', 'options': ['Yes', 'No', 'Not sure']}]
+
+
+@pytest.mark.parametrize('mode', ['strict', 'weighted'])
+def test_policy_keeps_opposite_readings_apart(app, mode):
+    scorer = app.Scorer(OPPOSED, GRAZING, mode)
+    assert scorer.outcomes(0) == [0, 1]
+    assert scorer.state_key([0, -1, -1]) != scorer.state_key([1, -1, -1])
+    for exact in (True, False):
+        table = app.compile_policy(scorer, max_states=10_000 if exact else 1)
+        # every state the table reaches asks a question that is still open there
+        frontier = [(scorer.empty(), scorer.start())]
+        while frontier:
+            answers, evidence = frontier.pop()
+            col = table.get(scorer.state_key(answers))
+            if col is None:
+                continue
+            assert col in scorer.remaining(answers, evidence)
+            for code in scorer.outcomes(col):
+                nxt = list(answers)
+                nxt[col] = code
+                frontier.append((nxt, scorer.update(evidence, col, code)))
+
+
+def test_policy_answer_must_be_open(app, monkeypatch):
+    scorer = app.Scorer(DISEASES, SYMPTOMS, 'strict')
+    answers, evidence = scorer.empty(), scorer.start()
+    answers[0] = 0
+    evidence = scorer.update(evidence, 0, 0)
+    monkeypatch.setattr(app, 'get_screen_policy', lambda: {scorer.state_key(answers): 0})
+    assert scorer.next_column(answers, evidence, 'policy') == scorer.next_column(answers, evidence, 'info_gain')